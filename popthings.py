@@ -40,7 +40,9 @@ Attributes
 ----------
 
 """
+from collections import deque
 from datetime import datetime, timedelta
+from functools import lru_cache
 from io import open
 import json
 import logging
@@ -54,7 +56,6 @@ try:
 except ImportError:
     # Python 2
     from urllib import quote
-import webbrowser
 
 try:
     # Shadow Python 2 input, which is eval(raw_input(prompt))
@@ -75,17 +76,32 @@ SPECIAL_TAGS_MAPPING = {
     "start": "when",
 }
 
+# Types of TaskPaper nodes. They are interned so that comparing types
+# of nodes is mostly a pointer comparison.
+_TYPE_PROJECT = sys.intern("project")
+_TYPE_TASK = sys.intern("task")
+_TYPE_NOTE = sys.intern("note")
+_TYPE_EMPTY = sys.intern("empty")
+_TYPE_ROOT = sys.intern("root")
+
+# Compact JSON encoder for the Things URL, created once rather than on
+# every call to json.dumps.
+_JSON_SEP = (",", ":")
+_encode_json = json.JSONEncoder(separators=_JSON_SEP).encode
+
 # Default placeholder symbol
 PLACEHOLDER_SYMBOL = "$"
 
-PATTERN_PROJECT = re.compile(r"^(?P<indent>\t*)(\s*)(?P<text>(?<!-\s).*):$")
-PATTERN_TASK = re.compile(r"^(?P<indent>\t*)(-\s(?P<text>.*))$")
-PATTERN_NOTE = re.compile(r"(?P<indent>\t*)(?P<text>[^\t]*.*)$")
 PATTERN_TAG = re.compile(
-    r"""(?:^|\s+)@             # space and @ before tag
+    r"""(?:^|\s)@              # space and @ before tag. A single
+                                                    # space, so that runs of
+                                                    # spaces aren't rescanned
                              (?P<name>\w+)          # the tag name
                              (?:\(                  # don't capture the ()
-                                 (?P<value>[^\)]*)  # the tag value, if any
+                                 (?P<value>         # the tag value, if any.
+                                     (?:[^\)\s]    # It stops at the next
+                                     |\s(?!@))*)    # tag, so that unclosed
+                                                    # values aren't rescanned
                                  \)                 # close the () pair
                                  )?                 # the value is optional
                              (?=\s|$)               # lookahead, match if
@@ -94,6 +110,11 @@ PATTERN_TAG = re.compile(
     re.VERBOSE,
 )
 
+# Bound methods of the pattern above, used in the per-line hot path to
+# skip the attribute lookups on every call.
+_search_tag = PATTERN_TAG.search
+_iter_tags = PATTERN_TAG.finditer
+
 # Patterns to match dates and dates with day offsets
 ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
 DATE_OFFSET_RE = re.compile(
@@ -133,14 +154,9 @@ def compute_date(date_str):
     if ISO_DATE_RE.match(date_str):
         return date_str
 
-    elif DATE_OFFSET_RE.match(date_str):
+    m = DATE_OFFSET_RE.match(date_str)
+    if m is not None:
         # Precompute dates with offsets of days
-        m = DATE_OFFSET_RE.match(date_str)
-        if m is None:
-            raise ValueError(
-                f"Unable to parse date '{date_str}' as 'YYYY-MM-DD+/-offset' date."
-            )
-
         try:
             op = {
                 "-": operator.sub,
@@ -162,6 +178,19 @@ def compute_date(date_str):
 
 
 class TPNode(object):
+    __slots__ = (
+        "line",
+        "text",
+        "indent",
+        "type",
+        "line_number",
+        "tags",
+        "parent",
+        "children",
+        "_has_project_parent",
+        "things_kind",
+    )
+
     def __init__(self, line, text, indent, type, line_number=None, tags=None):
         """
         A node of the TaskPaper document tree.
@@ -187,13 +216,18 @@ class TPNode(object):
         self.line_number = line_number
         self.tags = tags if tags is not None else []
         self.parent = None
-        self.children = []
+        # Most nodes are leaves, the list is only created for the first
+        # child.
+        self.children = None
+        self._has_project_parent = False
+        # Things type of the node, see `_compute_things_kind`.
+        self.things_kind = self._compute_things_kind()
 
     def __repr__(self):
         return (
-            "TPNode({self.text!r}, type={self.type!r},"
-            "tags={self.tags}, indent={self.indent})"
-        ).format(self=self)
+            f"TPNode({self.text!r}, type={self.type!r},"
+            f"tags={self.tags}, indent={self.indent})"
+        )
 
     @classmethod
     def from_line(cls, line, line_number=None):
@@ -212,25 +246,8 @@ class TPNode(object):
         node : TPNode
 
         """
-        text_without_tags, tags_text = cls.split_text_and_tags(line)
-        tags = cls.find_tags(tags_text)
-
-        match = PATTERN_TASK.match(text_without_tags)
-        if match:
-            type = "task"
-        else:
-            match = PATTERN_PROJECT.match(text_without_tags)
-            if match:
-                type = "project"
-            else:
-                match = PATTERN_NOTE.match(text_without_tags)
-                if match:
-                    type = "note"
-                else:
-                    type = "empty"
-        indent = len(match.group("indent"))
-        text = match.group("text")
-        return TPNode(line, text, indent, type, line_number, tags=tags)
+        text, indent, type, tags = _parse_line(line)
+        return TPNode(line, text, indent, type, line_number, tags=list(tags))
 
     @classmethod
     def split_text_and_tags(cls, line):
@@ -250,10 +267,16 @@ class TPNode(object):
             Text containing tags.
 
         """
-        text_without_tags, sep, tags_text = line.partition(" @")
-        if sep:
-            text_without_tags = text_without_tags.rstrip()
-        return text_without_tags, sep + tags_text
+        if "@" not in line:
+            # Most lines have no tags, skip the regex.
+            return line, ""
+        # Tags need some text before them, a line starting with a tag is
+        # a note.
+        start = len(line) - len(line.lstrip()) + 1
+        match = _search_tag(line, start)
+        if match is None:
+            return line, ""
+        return line[: match.start()].rstrip(), line[match.start() :]
 
     def add_child(self, node):
         """
@@ -267,27 +290,68 @@ class TPNode(object):
         """
 
         node.parent = self
-        self.children.append(node)
+        if self.children is None:
+            self.children = [node]
+        else:
+            self.children.append(node)
+        # Keep has_project_parent and things_kind up to date for the
+        # node and, if a subtree is being added, for its descendants.
+        if node.children:
+            nodes = node.walk()
+        else:
+            nodes = (node,)
+        for descendant in nodes:
+            parent = descendant.parent
+            descendant._has_project_parent = (
+                parent.is_project() or parent._has_project_parent
+            )
+            descendant.things_kind = descendant._compute_things_kind()
+
+    def _compute_things_kind(self):
+        """
+        Find the type of the Things object the node represents.
+
+        It depends on the node type, and on its position in the tree,
+        which is why it's recomputed when the node is linked.
+
+        Returns
+        -------
+        things_kind : str or None
+            One of 'project', 'heading', 'to-do', 'checklist-item' or
+            'note'. None for the root node.
+
+        """
+        if self.type == _TYPE_PROJECT:
+            if self._has_project_parent:
+                return ThingsHeading.type
+            return ThingsProject.type
+        elif self.type == _TYPE_TASK:
+            if self.parent is not None and self.parent.is_task():
+                return ThingsChecklistItem.type
+            return ThingsToDo.type
+        elif self.type == _TYPE_ROOT:
+            return None
+        return ThingsNote.type
 
     def is_project(self):
         """True is the node is of type 'project'."""
-        return self.type == "project"
+        return self.type == _TYPE_PROJECT
 
     def is_task(self):
         """True is the node is of type 'task'."""
-        return self.type == "task"
+        return self.type == _TYPE_TASK
 
     def is_note(self):
         """True is the node is of type 'note'."""
-        return self.type == "note"
+        return self.type == _TYPE_NOTE
 
     def is_empty(self):
         """True is the node is of type 'empty'."""
-        return self.type == "empty"
+        return self.type == _TYPE_EMPTY
 
     def is_root(self):
         """True if the node is the root of the TaskPaper tree."""
-        return self.type == "root"
+        return self.type == _TYPE_ROOT
 
     def flatten(self):
         """
@@ -300,10 +364,26 @@ class TPNode(object):
         nodes : list of TPNodes
 
         """
-        flattened = [self] if self.type != "root" else []
-        for child in self.children:
-            flattened.extend(child.flatten())
-        return flattened
+        return list(self.walk())
+
+    def walk(self):
+        """
+        Iterate over the tree in document order, without recursion.
+
+        The root node itself is not yielded.
+
+        Yields
+        ------
+        node : TPNode
+
+        """
+        stack = deque([self])
+        while stack:
+            node = stack.popleft()
+            if node.type != _TYPE_ROOT:
+                yield node
+            if node.children:
+                stack.extendleft(reversed(node.children))
 
     def has_project_parent(self):
         """
@@ -316,17 +396,11 @@ class TPNode(object):
         Note
         ----
         This is not part of the usual Tree API, but it's useful to
-        identify 'project' nodes that are Things Headers.
+        identify 'project' nodes that are Things Headers. The value is
+        computed by `add_child`, so it doesn't walk up the tree.
 
         """
-        parent = self.parent
-        if parent is None:
-            return False
-        while not parent.is_project():
-            if parent.is_root():
-                return False
-            parent = parent.parent
-        return True
+        return self._has_project_parent
 
     @staticmethod
     def find_tags(text):
@@ -346,12 +420,59 @@ class TPNode(object):
 
         """
         tags = []
-        for tag in PATTERN_TAG.finditer(text):
+        for tag in _iter_tags(text):
             tags.append((tag.group("name"), tag.group("value")))
         return tags
 
 
+@lru_cache(maxsize=4096)
+def _parse_line(line):
+    """
+    Parse a line of text into its text, indent, type, and tags.
+
+    Templates repeat a lot of lines, like blank lines, so the result is
+    cached. It doesn't depend on the line number, which is set by
+    `TPNode.from_line`.
+
+    Parameters
+    ----------
+    line : str
+        The content of the line.
+
+    Returns
+    -------
+    text : str
+    indent : int
+    type : str
+    tags : tuple of tuples
+        Tuple of (tag_name, tag_value) tuples.
+
+    """
+    text_without_tags, tags_text = TPNode.split_text_and_tags(line)
+    tags = TPNode.find_tags(tags_text) if tags_text else ()
+
+    # The line type only depends on the leading tabs and on a couple
+    # of characters, so it's classified without a regex.
+    stripped = text_without_tags.lstrip("\t")
+    indent = len(text_without_tags) - len(stripped)
+    if stripped[:1] == "-" and stripped[1:2].isspace():
+        type = _TYPE_TASK
+        text = stripped[2:]
+    elif stripped.endswith(":"):
+        type = _TYPE_PROJECT
+        text = stripped.lstrip()[:-1]
+    elif stripped:
+        type = _TYPE_NOTE
+        text = stripped
+    else:
+        type = _TYPE_EMPTY
+        text = stripped
+    return text, indent, type, tuple(tags)
+
+
 class ThingsObject(object):
+    __slots__ = ("title",)
+
     #: Things item type
     type = None
 
@@ -376,24 +497,26 @@ class ThingsObject(object):
         """
 
         self.title = title
-        # Mapping between Python attribute names and JSON keys.
-        self._attrs_mapping = {}
 
     def __repr__(self):
-        args = ", ".join(
-            "{k}={v!r}".format(k=k, v=v)
-            for k, v in self.__dict__.items()
-            if not k.startswith("_")
+        attrs = (
+            name.lstrip("_")
+            for klass in reversed(self.__class__.__mro__)
+            for name in getattr(klass, "__slots__", ())
+            # Private slots backing a public property show up as the property.
+            if hasattr(klass, name.lstrip("_"))
         )
-        return "{self.__class__.__name__}({args})".format(self=self, args=args)
+        args = ", ".join(f"{k}={getattr(self, k)!r}" for k in attrs)
+        return f"{self.__class__.__name__}({args})"
 
     @classmethod
-    def from_tp_node(self, node):
+    def from_tp_node(cls, node):
         """
         Factory function to create a Things object from a Taskpaper
         TPNode object.
 
-        The exact type of the object returned depends on TPNode.type.
+        The exact type of the object returned depends on
+        TPNode.things_kind.
 
         Parameters
         ----------
@@ -404,22 +527,15 @@ class ThingsObject(object):
         item : Things object
 
         """
-        self.node = node
-        special_tags, regular_tags = self._split_special_tags(node.tags)
+        things_class = _THINGS_CLASSES.get(node.things_kind)
+        if things_class is None:
+            raise ValueError("Node type not recognised.", node)
+        if not issubclass(things_class, _ThingsRichObject):
+            return things_class(node.text)
+        special_tags, regular_tags = cls._split_special_tags(node.tags)
         special_tags_dict = {name: value for name, value in special_tags}
         tags_str = [name for name, value in regular_tags]
-        if self.is_project(node):
-            return ThingsProject(node.text, tags=tags_str, **special_tags_dict)
-        elif self.is_heading(node):
-            return ThingsHeading(node.text)
-        elif self.is_todo(node):
-            return ThingsToDo(node.text, tags=tags_str, **special_tags_dict)
-        elif self.is_checklist_item(node):
-            return ThingsChecklistItem(node.text)
-        elif self.is_note(node):
-            return ThingsNote(node.text)
-        else:
-            raise ValueError("Node type not recognised.", node)
+        return things_class(node.text, tags=tags_str, **special_tags_dict)
 
     @staticmethod
     def _split_special_tags(tags):
@@ -450,27 +566,27 @@ class ThingsObject(object):
     @staticmethod
     def is_heading(tp_node):
         """True if the TPNode is a Things heading."""
-        return tp_node.is_project() and tp_node.has_project_parent()
+        return tp_node.things_kind == ThingsHeading.type
 
     @staticmethod
     def is_project(tp_node):
         """True if the TPNode is a Things project."""
-        return tp_node.is_project() and not tp_node.has_project_parent()
+        return tp_node.things_kind == ThingsProject.type
 
     @staticmethod
     def is_checklist_item(tp_node):
         """True if the TPNode a Things checklist item."""
-        return tp_node.is_task() and tp_node.parent.is_task()
+        return tp_node.things_kind == ThingsChecklistItem.type
 
     @staticmethod
     def is_todo(tp_node):
         """True if the TPNode is a Things to-do item."""
-        return tp_node.is_task() and not tp_node.parent.is_task()
+        return tp_node.things_kind == ThingsToDo.type
 
     @staticmethod
     def is_note(tp_node):
         """True if the TPNode is a Things note."""
-        return tp_node.is_note() or tp_node.is_empty()
+        return tp_node.things_kind == ThingsNote.type
 
     def to_json(self):
         """
@@ -482,20 +598,12 @@ class ThingsObject(object):
         d : dict
 
         """
-        d = {
-            "type": self.type,
-            "attributes": {
-                "title": self.title,
-            },
-        }
-        for obj_attr, things_attr in self._attrs_mapping.items():
-            value = getattr(self, obj_attr)
-            if value:
-                d["attributes"][things_attr] = value
-        return d
+        return _JSON_CONVERTERS[self.type](self)
 
 
 class _ThingsRichObject(ThingsObject):
+    __slots__ = ("_notes", "when", "deadline", "tags")
+
     def __init__(self, title, notes="", when=None, deadline=None, tags=None):
         """
         Private Things object that has nodes, when date, deadline, and tags.
@@ -519,14 +627,17 @@ class _ThingsRichObject(ThingsObject):
         if tags is None:
             tags = []
         self.tags = tags
-        # Mapping between Python attribute names and JSON keys.
-        attrs_mapping = {
-            "notes": "notes",
-            "when": "when",
-            "deadline": "deadline",
-            "tags": "tags",
-        }
-        self._attrs_mapping.update(attrs_mapping)
+
+    @property
+    def notes(self):
+        """Notes for that object, one line per note added."""
+        return "\n".join(self._notes)
+
+    @notes.setter
+    def notes(self, notes):
+        # Lines are only joined when the notes are read, so adding many
+        # notes doesn't copy the whole text every time.
+        self._notes = [notes] if notes else []
 
     def add_note(self, node):
         """
@@ -538,15 +649,15 @@ class _ThingsRichObject(ThingsObject):
             Node containing the note's text.
 
         """
-        if self.notes:
-            note_text = "\n{node.title}".format(node=node)
-        else:
-            note_text = node.title
-        self.notes += note_text
+        # Empty notes are skipped until there is some text.
+        if self._notes or node.title:
+            self._notes.append(node.title)
 
 
 class ThingsToDo(_ThingsRichObject):
-    type = "to-do"
+    __slots__ = ("checklist_items",)
+
+    type = sys.intern("to-do")
 
     def __init__(
         self, title, notes="", when=None, deadline=None, tags=None, checklist_items=None
@@ -591,25 +702,11 @@ class ThingsToDo(_ThingsRichObject):
         """
         self.checklist_items.append(node)
 
-    def to_json(self):
-        """
-        Convert the object and its children to a JSON object following
-        the Things JSON schema.
-
-        Returns
-        -------
-        d : dict
-
-        """
-        d = super(ThingsToDo, self).to_json()
-        d["attributes"]["checklist-items"] = [
-            item.to_json() for item in self.checklist_items
-        ]
-        return d
-
 
 class ThingsProject(_ThingsRichObject):
-    type = "project"
+    __slots__ = ("items", "area")
+
+    type = sys.intern("project")
 
     def __init__(
         self,
@@ -649,7 +746,6 @@ class ThingsProject(_ThingsRichObject):
             items = []
         self.items = items
         self.area = area
-        self._attrs_mapping["area"] = "area"
 
     def add_item(self, item):
         """
@@ -662,20 +758,6 @@ class ThingsProject(_ThingsRichObject):
         """
         self.items.append(item)
 
-    def to_json(self):
-        """
-        Convert the object and its children to a JSON object following
-        the Things JSON schema.
-
-        Returns
-        -------
-        d : dict
-
-        """
-        d = super(ThingsProject, self).to_json()
-        d["attributes"]["items"] = [item.to_json() for item in self.items]
-        return d
-
 
 class ThingsHeading(ThingsObject):
     """
@@ -688,7 +770,9 @@ class ThingsHeading(ThingsObject):
 
     """
 
-    type = "heading"
+    __slots__ = ()
+
+    type = sys.intern("heading")
 
 
 class ThingsChecklistItem(ThingsObject):
@@ -702,7 +786,9 @@ class ThingsChecklistItem(ThingsObject):
 
     """
 
-    type = "checklist-item"
+    __slots__ = ()
+
+    type = sys.intern("checklist-item")
 
 
 class ThingsNote(ThingsObject):
@@ -716,7 +802,87 @@ class ThingsNote(ThingsObject):
 
     """
 
-    type = "note"
+    __slots__ = ()
+
+    type = sys.intern("note")
+
+
+# Mapping between Things types and the classes representing them.
+_THINGS_CLASSES = {
+    things_class.type: things_class
+    for things_class in (
+        ThingsProject,
+        ThingsHeading,
+        ThingsToDo,
+        ThingsChecklistItem,
+        ThingsNote,
+    )
+}
+
+
+def _object_to_json(obj):
+    """Things JSON object with only a title, used for leaf items."""
+    return {"type": obj.type, "attributes": {"title": obj.title}}
+
+
+def _rich_object_attributes(obj):
+    """JSON attributes shared by to-do items and projects."""
+    attributes = {"title": obj.title}
+    if obj._notes:
+        attributes["notes"] = obj.notes
+    if obj.when:
+        attributes["when"] = obj.when
+    if obj.deadline:
+        attributes["deadline"] = obj.deadline
+    if obj.tags:
+        attributes["tags"] = obj.tags
+    return attributes
+
+
+def _todo_to_json(todo):
+    """Things JSON object for a ThingsToDo and its checklist items."""
+    attributes = _rich_object_attributes(todo)
+    attributes["checklist-items"] = [
+        _object_to_json(item) for item in todo.checklist_items
+    ]
+    return {"type": todo.type, "attributes": attributes}
+
+
+def _project_to_json(project):
+    """Things JSON object for a ThingsProject and its items."""
+    attributes = _rich_object_attributes(project)
+    if project.area:
+        attributes["area"] = project.area
+    attributes["items"] = [_JSON_CONVERTERS[item.type](item) for item in project.items]
+    return {"type": project.type, "attributes": attributes}
+
+
+# Mapping between Things types and the functions converting objects of
+# that type to the Things JSON schema.
+_JSON_CONVERTERS = {
+    ThingsProject.type: _project_to_json,
+    ThingsToDo.type: _todo_to_json,
+    ThingsHeading.type: _object_to_json,
+    ThingsChecklistItem.type: _object_to_json,
+    ThingsNote.type: _object_to_json,
+}
+
+
+def things_objects_to_json(things_objs):
+    """
+    Convert Things objects to a list of JSON objects following the
+    Things JSON schema.
+
+    Parameters
+    ----------
+    things_objs : list of ThingsObject
+
+    Returns
+    -------
+    out : list of JSON objects
+
+    """
+    return [_JSON_CONVERTERS[obj.type](obj) for obj in things_objs]
 
 
 def find_and_replace_placeholders(text, symbol=PLACEHOLDER_SYMBOL):
@@ -748,21 +914,33 @@ def find_and_replace_placeholders(text, symbol=PLACEHOLDER_SYMBOL):
             - Task @due($due) @start($start)
 
     """
+    # Split like build_taskpaper_document_tree does, so that all line
+    # endings are recognized.
     lines = text.splitlines()
-    placeholder_line = lines[1].strip()
+    placeholder_line = lines[1].strip() if len(lines) > 1 else ""
     if not placeholder_line.startswith(symbol):
         # Text without placeholders
         return text
 
     new_text = "\n".join(lines[:1] + lines[2:])
     placeholders = [name.strip() for name in placeholder_line.split(symbol) if name]
+    values = {}
     for name in placeholders:
+        if name in values:
+            continue
         name_prompt = name.capitalize()
-        value = input("{} value? ".format(name_prompt))
-        new_text = new_text.replace(
-            "{symbol}{name}".format(symbol=symbol, name=name), value
-        )
-    return new_text
+        values[name] = input(f"{name_prompt} value? ")
+    if not values:
+        # Placeholder line with only the symbol, nothing to replace.
+        return new_text
+
+    # Replace all the placeholders in a single pass over the text. Longer
+    # names come first so that '$date' doesn't shadow '$date_end'.
+    names = sorted(values, key=len, reverse=True)
+    pattern = re.compile(
+        re.escape(symbol) + "(" + "|".join(map(re.escape, names)) + ")"
+    )
+    return pattern.sub(lambda m: values[m.group(1)], new_text)
 
 
 def things_objects_from_taskpaper_tree(tree):
@@ -779,23 +957,27 @@ def things_objects_from_taskpaper_tree(tree):
 
     """
     things_nodes = []
-    for tp_node in tree.flatten():
+    # Nodes are classified once, by from_tp_node, during a single walk
+    # over the tree. The type of the Things object is enough to know
+    # where it goes.
+    for tp_node in tree.walk():
         things_obj = ThingsObject.from_tp_node(tp_node)
-        if things_obj.is_project(tp_node):
+        things_type = things_obj.type
+        if things_type == ThingsProject.type:
             # Add as top-level item in the list of things_nodes
             things_nodes.append(things_obj)
             last_things_obj_accepting_notes = things_obj
-        elif things_obj.is_todo(tp_node):
+        elif things_type == ThingsToDo.type:
             # Add as regular item to most-recent project
             things_nodes[-1].add_item(things_obj)
             last_things_obj_accepting_notes = things_obj
-        elif things_obj.is_heading(tp_node):
+        elif things_type == ThingsHeading.type:
             # Add as regular item to most-recent project
             things_nodes[-1].add_item(things_obj)
-        elif things_obj.is_checklist_item(tp_node):
+        elif things_type == ThingsChecklistItem.type:
             # Add to most recent task of most recent project.
             things_nodes[-1].items[-1].add_checklist_item(things_obj)
-        elif things_obj.is_note(tp_node):
+        elif things_type == ThingsNote.type:
             last_things_obj_accepting_notes.add_note(things_obj)
     return things_nodes
 
@@ -815,45 +997,22 @@ def build_taskpaper_document_tree(text):
         The document root node.
 
     """
-    nodes = [
-        TPNode.from_line(line, line_number)
-        for line_number, line in enumerate(text.splitlines())
-    ]
-
-    root = TPNode("", "", -1, type="root")
-    previous_node = root
-    for node in nodes:
-        if node.indent == previous_node.indent:
-            log.debug(
-                "Adding {node} to {previous_node.parent}".format(
-                    node=node, previous_node=previous_node
-                )
-            )
-            previous_node.parent.add_child(node)
-        if node.indent > previous_node.indent:
-            log.debug(
-                "Adding {node} to {previous_node}".format(
-                    node=node, previous_node=previous_node
-                )
-            )
-            previous_node.add_child(node)
-        if node.indent < previous_node.indent:
-            log.debug(
-                "{node} is aunt of {previous_node}".format(
-                    node=node, previous_node=previous_node
-                )
-            )
-            # Find the parent whose indent difference is 1 and add sister
-            previous_parent = previous_node
-            while node.indent <= previous_parent.indent:
-                previous_parent = previous_parent.parent
-            log.debug(
-                "Adding {node} to {previous_parent}".format(
-                    node=node, previous_parent=previous_parent
-                )
-            )
-            previous_parent.add_child(node)
-        previous_node = node
+    root = TPNode("", "", -1, type=_TYPE_ROOT)
+    # Ancestors of the current line, from the root down to the previous
+    # node. Their indents are strictly increasing.
+    parents = [root]
+    for line_number, line in enumerate(text.splitlines()):
+        # Nodes are linked as soon as they are parsed, so the document
+        # is only traversed once.
+        node = TPNode.from_line(line, line_number)
+        # The parent is the closest ancestor that is less indented.
+        while parents[-1].indent >= node.indent:
+            parents.pop()
+        parent = parents[-1]
+        # Let logging format the message, only if debug logging is enabled.
+        log.debug("Adding %r to %r", node, parent)
+        parent.add_child(node)
+        parents.append(node)
     return root
 
 
@@ -873,7 +1032,7 @@ def taskpaper_template_to_things_json(text):
     """
     tree = build_taskpaper_document_tree(text)
     things_objs = things_objects_from_taskpaper_tree(tree)
-    return [item.to_json() for item in things_objs]
+    return things_objects_to_json(things_objs)
 
 
 def build_things_url(things_json):
@@ -894,8 +1053,8 @@ def build_things_url(things_json):
     https://support.culturedcode.com/customer/en/portal/articles/2803573
 
     """
-    json_str = json.dumps(things_json, separators=(",", ":"))
-    url = "things:///json?data={}".format(quote(json_str))
+    json_str = _encode_json(things_json)
+    url = "things:///json?data=" + quote(json_str)
     return url
 
 
@@ -961,6 +1120,9 @@ def taskpaper_to_things(text):
         The TaskPaper document.
 
     """
+    # Only needed to open the URL, don't pay for the import at startup.
+    import webbrowser
+
     things_json = taskpaper_template_to_things_json(text)
     url = build_things_url(things_json)
     webbrowser.open(url)
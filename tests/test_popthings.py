@@ -1,6 +1,19 @@
 from unittest import TestCase
+from unittest.mock import patch
 
-from popthings import TPNode, ThingsToDo, ThingsProject
+from popthings import (
+    TPNode,
+    ThingsChecklistItem,
+    ThingsNote,
+    ThingsObject,
+    ThingsToDo,
+    ThingsProject,
+    build_taskpaper_document_tree,
+    build_things_url,
+    find_and_replace_placeholders,
+    taskpaper_template_to_things_json,
+    things_objects_to_json,
+)
 
 
 template = """
@@ -40,6 +53,59 @@ class TestTPNodeTypes(TestCase):
     def test_is_note(self):
         self.assertTrue(TPNode.from_line("Note").is_note())
         self.assertTrue(TPNode.from_line("-Note").is_note())
+        self.assertTrue(TPNode.from_line(" ").is_note())
+
+    def test_is_empty(self):
+        self.assertTrue(TPNode.from_line("").is_empty())
+        self.assertTrue(TPNode.from_line("\t\t").is_empty())
+        self.assertFalse(TPNode.from_line("Note").is_empty())
+
+
+class TestTPNodeFromLine(TestCase):
+    def test_repeated_lines_are_distinct_nodes(self):
+        first = TPNode.from_line("- Task @home", 1)
+        second = TPNode.from_line("- Task @home", 2)
+        self.assertIsNot(first, second)
+        self.assertEqual(first.line_number, 1)
+        self.assertEqual(second.line_number, 2)
+        first.tags.append(("work", None))
+        self.assertEqual(second.tags, [("home", None)])
+
+
+class TestTPNodeTags(TestCase):
+    def test_split_text_and_tags(self):
+        self.assertEqual(
+            TPNode.split_text_and_tags("- Task @due(today) @home"),
+            ("- Task", " @due(today) @home"),
+        )
+        self.assertEqual(TPNode.split_text_and_tags("- Task"), ("- Task", ""))
+
+    def test_at_sign_in_text(self):
+        self.assertEqual(
+            TPNode.split_text_and_tags("Meet @ home:"), ("Meet @ home:", "")
+        )
+        self.assertTrue(TPNode.from_line("Meet @ home:").is_project())
+
+    def test_tags(self):
+        node = TPNode.from_line("\t- Task @due(today) @home")
+        self.assertEqual(node.text, "Task")
+        self.assertEqual(node.tags, [("due", "today"), ("home", None)])
+
+    def test_many_spaces(self):
+        line = "- Task" + " " * 100000 + "@home("
+        self.assertEqual(TPNode.split_text_and_tags(line), (line, ""))
+
+    def test_many_unclosed_values(self):
+        line = "- Task" + " @a(" * 100000
+        node = TPNode.from_line(line)
+        self.assertEqual(node.text, line[2:])
+        self.assertEqual(node.tags, [])
+
+    def test_leading_tag_is_note(self):
+        node = TPNode.from_line("\t@home")
+        self.assertTrue(node.is_note())
+        self.assertEqual(node.text, "@home")
+        self.assertEqual(node.tags, [])
 
 
 class TestTPNodeIndent(TestCase):
@@ -49,6 +115,7 @@ class TestTPNodeIndent(TestCase):
         self.assertEqual(TPNode.from_line("\t\t- Task").indent, 2)
         self.assertEqual(TPNode.from_line(" - Task").indent, 0)
         self.assertEqual(TPNode.from_line("    - Task").indent, 0)
+        self.assertEqual(TPNode.from_line("\t\t").indent, 2)
 
 
 class TestThingsObjectToJson(TestCase):
@@ -67,3 +134,224 @@ class TestThingsObjectToJson(TestCase):
         obj = ThingsProject("Project")
         target = {"type": "project", "attributes": {"title": "Project", "items": []}}
         self.assertEqual(obj.to_json(), target)
+
+    def test_project_with_items(self):
+        todo = ThingsToDo("Task", when="2018-12-30 + 1", tags=["home"])
+        todo.add_checklist_item(ThingsChecklistItem("Item"))
+        obj = ThingsProject("Project", area="Work", items=[todo])
+        target = {
+            "type": "project",
+            "attributes": {
+                "title": "Project",
+                "area": "Work",
+                "items": [
+                    {
+                        "type": "to-do",
+                        "attributes": {
+                            "title": "Task",
+                            "when": "2018-12-31",
+                            "tags": ["home"],
+                            "checklist-items": [
+                                {
+                                    "type": "checklist-item",
+                                    "attributes": {"title": "Item"},
+                                }
+                            ],
+                        },
+                    }
+                ],
+            },
+        }
+        self.assertEqual(obj.to_json(), target)
+        self.assertEqual(things_objects_to_json([obj]), [target])
+
+
+class TestDocumentTree(TestCase):
+    def test_parents(self):
+        text = "Project:\n\t- Task\n\t\t- Item\n\t\t\t- Sub-item\n\t- Other task"
+        tree = build_taskpaper_document_tree(text)
+        parents = [node.parent.text for node in tree.flatten()]
+        self.assertEqual(parents, ["", "Project", "Task", "Item", "Project"])
+
+    def test_has_project_parent(self):
+        text = "Project:\n\tHeading:\n\t\t- Task\n- Other task"
+        tree = build_taskpaper_document_tree(text)
+        flags = [node.has_project_parent() for node in tree.flatten()]
+        self.assertEqual(flags, [False, True, True, False])
+
+    def test_has_project_parent_add_subtree(self):
+        task = TPNode.from_line("\t- Task")
+        item = TPNode.from_line("\t\t- Item")
+        task.add_child(item)
+        self.assertFalse(item.has_project_parent())
+        TPNode.from_line("Project:").add_child(task)
+        self.assertTrue(item.has_project_parent())
+
+    def test_indent_jump(self):
+        text = "Project:\n\t\t\t- Task\n\t\t- Other task"
+        tree = build_taskpaper_document_tree(text)
+        parents = [node.parent.text for node in tree.flatten()]
+        self.assertEqual(parents, ["", "Project", "Project"])
+
+
+class TestTPNodeFlatten(TestCase):
+    def test_document_order(self):
+        tree = build_taskpaper_document_tree(template)
+        lines = [node.line for node in tree.flatten()]
+        self.assertEqual(lines, template.splitlines())
+
+    def test_leaves_have_no_children(self):
+        tree = build_taskpaper_document_tree("Project:\n\t- Task")
+        project, task = tree.flatten()
+        self.assertEqual(project.children, [task])
+        self.assertIsNone(task.children)
+
+    def test_deep_nesting(self):
+        depth = 5000
+        root = TPNode("", "", -1, type="root")
+        parent = root
+        for indent in range(depth):
+            node = TPNode("- Task", "Task", indent, "task")
+            parent.add_child(node)
+            parent = node
+        self.assertEqual(len(root.flatten()), depth)
+
+
+class TestPlaceholders(TestCase):
+    def test_no_placeholders(self):
+        text = "Project:\n\t- Task\n"
+        self.assertEqual(find_and_replace_placeholders(text), text)
+
+    def test_single_line(self):
+        self.assertEqual(find_and_replace_placeholders("Project:"), "Project:")
+
+    @patch("builtins.input", side_effect=["Paris", "2018-12-31"])
+    def test_replace(self, mock_input):
+        text = "Trip to $city:\n\t$city $date\n\t- Leave @start($date)"
+        self.assertEqual(
+            find_and_replace_placeholders(text),
+            "Trip to Paris:\n\t- Leave @start(2018-12-31)",
+        )
+        self.assertEqual(mock_input.call_count, 2)
+
+    @patch("builtins.input", return_value="Paris")
+    def test_line_endings(self, mock_input):
+        for newline in ("\r\n", "\r", "\u2028"):
+            text = newline.join(["Trip to $city:", "\t$city", "\t- Leave"])
+            self.assertEqual(
+                find_and_replace_placeholders(text), "Trip to Paris:\n\t- Leave"
+            )
+
+    @patch("builtins.input")
+    def test_symbol_only(self, mock_input):
+        text = "Project:\n\t$\n\t- Task $b"
+        self.assertEqual(find_and_replace_placeholders(text), "Project:\n\t- Task $b")
+        mock_input.assert_not_called()
+
+    @patch("builtins.input", side_effect=["2018-12-01", "2018-12-31"])
+    def test_placeholder_prefix(self, mock_input):
+        text = "Trip:\n\t$date $date_end\n\t- Leave @start($date) @due($date_end)"
+        self.assertEqual(
+            find_and_replace_placeholders(text),
+            "Trip:\n\t- Leave @start(2018-12-01) @due(2018-12-31)",
+        )
+
+
+class TestThingsNotes(TestCase):
+    def test_add_note(self):
+        obj = ThingsToDo("Task", notes="First")
+        obj.add_note(ThingsNote("Second"))
+        obj.add_note(ThingsNote("Third"))
+        self.assertEqual(obj.notes, "First\nSecond\nThird")
+        self.assertEqual(obj.to_json()["attributes"]["notes"], obj.notes)
+
+    def test_leading_empty_notes(self):
+        obj = ThingsProject("Project")
+        obj.add_note(ThingsNote(""))
+        obj.add_note(ThingsNote("Note"))
+        obj.add_note(ThingsNote(""))
+        self.assertEqual(obj.notes, "Note\n")
+
+
+class TestThingsObjectFromTPNode(TestCase):
+    def test_does_not_keep_node_on_class(self):
+        ThingsObject.from_tp_node(TPNode.from_line("Project:"))
+        self.assertFalse(hasattr(ThingsObject, "node"))
+
+    def test_things_types(self):
+        text = "Project:\n\tHeading:\n\t\t- Task\n\t\t\t- Item\n\t\t\tNote\n"
+        tree = build_taskpaper_document_tree(text)
+        things_types = [ThingsObject.from_tp_node(node).type for node in tree.flatten()]
+        self.assertEqual(
+            things_types, ["project", "heading", "to-do", "checklist-item", "note"]
+        )
+
+    def test_root_node(self):
+        with self.assertRaises(ValueError):
+            ThingsObject.from_tp_node(TPNode("", "", -1, type="root"))
+
+    def test_repr(self):
+        obj = ThingsToDo("Task", tags=["home"])
+        self.assertEqual(
+            repr(obj),
+            "ThingsToDo(title='Task', notes='', when=None, deadline=None, "
+            "tags=['home'], checklist_items=[])",
+        )
+
+
+class TestTaskPaperToThingsJson(TestCase):
+    def test_document(self):
+        text = (
+            "Project: @due(2018-12-31)\n"
+            "\tProject note\n"
+            "\t- Task @home\n"
+            "\t\tTask note\n"
+            "\t\t- Item\n"
+            "\tHeading:\n"
+            "\t- Task under heading\n"
+        )
+        target = [
+            {
+                "type": "project",
+                "attributes": {
+                    "title": "Project",
+                    "notes": "Project note",
+                    "deadline": "2018-12-31",
+                    "items": [
+                        {
+                            "type": "to-do",
+                            "attributes": {
+                                "title": "Task",
+                                "notes": "Task note",
+                                "tags": ["home"],
+                                "checklist-items": [
+                                    {
+                                        "type": "checklist-item",
+                                        "attributes": {"title": "Item"},
+                                    }
+                                ],
+                            },
+                        },
+                        {"type": "heading", "attributes": {"title": "Heading"}},
+                        {
+                            "type": "to-do",
+                            "attributes": {
+                                "title": "Task under heading",
+                                "checklist-items": [],
+                            },
+                        },
+                    ],
+                },
+            }
+        ]
+        self.assertEqual(taskpaper_template_to_things_json(text), target)
+
+
+class TestBuildThingsUrl(TestCase):
+    def test_compact_json(self):
+        things_json = [{"type": "to-do", "attributes": {"title": "Task"}}]
+        self.assertEqual(
+            build_things_url(things_json),
+            "things:///json?data=%5B%7B%22type%22%3A%22to-do%22%2C%22attributes"
+            "%22%3A%7B%22title%22%3A%22Task%22%7D%7D%5D",
+        )